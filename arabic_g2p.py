@@ -3,9 +3,83 @@
 # Arabic G2P implementation with IPA output for Egyptian Arabic
 # Adapted from: https://github.com/nawarhalabi/Arabic-Phonetiser/blob/master/phonetise-Buckwalter.py
 
+import codecs
+import functools
 import re
+import unicodedata
+
+# A short vowel, tanween or sukun followed by shadda. NFC puts shadda last;
+# the Buckwalter rules below expect it first, the usual typing order.
+_RE_SHADDA_AFTER_MARK = re.compile(u'([\u064b-\u0650\u0652])\u0651')
+
+# Single-character deletions applied in one pass (sukun)
+_STRIP_CHARS = b'o'
+
+# Hamza rules fused into a single scan. Alternatives, in order:
+#   A followed by a short vowel        -> hamza + vowel
+#   > at utterance start / after space -> insert 'a' unless a vowel follows
+#   < not followed by 'i'              -> insert 'i'
+# The A[aiu] lookaheads reproduce the original sequential re.sub passes,
+# where the Alef rewrite ran before the hamza rules looked at the next char.
+# Patterns are bytes: this stage runs on the ASCII-encoded Buckwalter text.
+# Every alternative and lookaround is at most two bytes wide, so matching
+# never backtracks more than a couple of bytes and stays linear in the
+# input. re2 would add nothing here, and it rejects the lookarounds anyway.
+_RE_HAMZA = re.compile(b'A([aiu])'
+                       b'|^>(?=[^auAw]|A[aiu])'
+                       b'|(?<= )>(?=[^auAw ]|A[aiu])'
+                       b'|<(A[aiu]|[^i])')
+_ALEF_HAMZA = {b'i': b'<i', b'a': b'>a', b'u': b'>u'}
+
+# Matches any utterance for which preprocess_utterance does more than drop
+# the alef after a space: tanween, short vowels, sukun, madda and
+# hamza-on-alef (in Arabic script or already in Buckwalter).
+_RE_NEEDS_RULES = re.compile(u'[\u064b-\u0650\u0652\u0622\u0623\u0625FNKaiuo|<>]')
+
+# Two-character Buckwalter sequences kept as a single long-vowel phoneme
+_LONG_VOWELS = (u'aa', u'ii', u'uu', u'AA', u'II', u'UU')
+
+
+def _hamza_repl(match):
+    vowel, following = match.group(1, 2)
+    if vowel is not None:
+        return _ALEF_HAMZA[vowel]
+    if following is not None:
+        if len(following) == 2:
+            following = _ALEF_HAMZA[following[1:]]
+        return b'<i' + following
+    return b'>a'
+
 
 class ArabicG2P:
+    __slots__ = ('arabic_to_buckw_dict', 'buckwalter_to_ipa', '_ar2bw_table',
+                 '_ar2bw_codec', '_ar2bw_bytes', '_ipa_table', '_long_vowel_ipa',
+                 '_word_cache', '_utterance_cache')
+    # Rebuilt rather than pickled (see __getstate__)
+    _TRANSIENT_SLOTS = ('_ar2bw_codec', '_ar2bw_bytes', '_word_cache', '_utterance_cache')
+
+    # Phoneme mappings (simplified version), shared by all instances
+    unambiguousConsonantMap = {
+        u'b': u'b', u'*': u'*', u'T': u'T', u'm': u'm',
+        u't': u't', u'r': u'r', u'Z': u'Z', u'n': u'n',
+        u'^': u'^', u'z': u'z', u'E': u'E', u'h': u'h',
+        u'j': u'j', u's': u's', u'g': u'g', u'H': u'H',
+        u'q': u'q', u'f': u'f', u'x': u'x', u'S': u'S',
+        u'$': u'$', u'd': u'd', u'D': u'D', u'k': u'k',
+        u'>': u'<', u'\'': u'<', u'}': u'<', u'&': u'<',
+        u'<': u'<'
+    }
+
+    vowelMap = {
+        u'A': u'aa', u'Y': u'aa', u'a': u'a',
+        u'i': u'i', u'u': u'u'
+    }
+
+    _DIACRITICS = frozenset(u'oauiFNK~')
+    _CONSONANTS = frozenset(u'><}&\'bt^jHxd*rzs$SDTZEgfqklmnh|')
+    # Characters emitted as-is when no mapping above applies
+    _KEPT_CHARS = _CONSONANTS | frozenset(u'wy')
+
     def __init__(self):
         # Mapping from Arabic script to Buckwalter
         self.arabic_to_buckw_dict = {
@@ -21,6 +95,8 @@ class ArabicG2P:
             u'\u064b': u'F', u'\u064c': u'N', u'\u064d': u'K', u'\u064e': u'a',
             u'\u064f': u'u', u'\u0650': u'i', u'\u0651': u'~', u'\u0652': u'o'
         }
+        self._ar2bw_table = str.maketrans({ord(k): v for k, v in self.arabic_to_buckw_dict.items()})
+        self._init_ascii_codec()
 
         # Buckwalter to IPA mapping for Egyptian Arabic
         self.buckwalter_to_ipa = {
@@ -63,36 +139,66 @@ class ArabicG2P:
             'AA': 'ɑː',  # Emphatic long a
         }
 
-        # Initialize phoneme mappings (simplified version)
-        self.unambiguousConsonantMap = {
-            u'b': u'b', u'*': u'*', u'T': u'T', u'm': u'm',
-            u't': u't', u'r': u'r', u'Z': u'Z', u'n': u'n',
-            u'^': u'^', u'z': u'z', u'E': u'E', u'h': u'h',
-            u'j': u'j', u's': u's', u'g': u'g', u'H': u'H',
-            u'q': u'q', u'f': u'f', u'x': u'x', u'S': u'S',
-            u'$': u'$', u'd': u'd', u'D': u'D', u'k': u'k',
-            u'>': u'<', u'\'': u'<', u'}': u'<', u'&': u'<',
-            u'<': u'<'
-        }
+        # process_word_simple resolves each ASCII byte straight to its IPA
+        # phoneme (None when the character is dropped) through this table,
+        # instead of a consonant/vowel map lookup followed by a dict lookup
+        self._ipa_table = [None] * 128
+        for code in range(128):
+            char = chr(code)
+            if char in self.unambiguousConsonantMap:
+                phoneme = self.unambiguousConsonantMap[char]
+            elif char in self.vowelMap:
+                phoneme = self.vowelMap[char]
+            elif char in self._KEPT_CHARS:
+                phoneme = char
+            else:
+                continue
+            self._ipa_table[code] = self.buckwalter_to_ipa_phoneme(phoneme)
+        self._long_vowel_ipa = {v.encode('ascii'): self.buckwalter_to_ipa_phoneme(v) for v in _LONG_VOWELS}
 
-        self.vowelMap = {
-            u'A': u'aa', u'Y': u'aa', u'a': u'a',
-            u'i': u'i', u'u': u'u'
-        }
+        self._init_caches()
+
+    def _init_ascii_codec(self):
+        # Arabic -> Buckwalter ASCII bytes in two C-level passes: a charmap
+        # codec sends ASCII to itself and each Arabic letter to a byte >= 128
+        # (anything else to '?'), then bytes.translate swaps those high bytes
+        # for the Buckwalter letters. Much faster than str.translate with a
+        # dict on non-ASCII text.
+        letters = u''.join(self.arabic_to_buckw_dict)
+        padding = 128 - len(letters)
+        self._ar2bw_codec = codecs.charmap_build(
+            u''.join(map(chr, range(128))) + letters + u'\ufffe' * padding)
+        self._ar2bw_bytes = (bytes(range(128))
+                             + u''.join(self.arabic_to_buckw_dict.values()).encode('ascii')
+                             + b'?' * padding)
+
+    def _init_caches(self):
+        # Per-instance memoisation: corpora repeat the same words (and, across
+        # epochs, the same utterances) over and over
+        self._word_cache = functools.lru_cache(maxsize=65536)(self._process_word_simple)
+        self._utterance_cache = functools.lru_cache(maxsize=8192)(self._process_utterance)
+
+    def __getstate__(self):
+        # The cache wrappers hold bound methods and the codec map is a C
+        # object; neither can be pickled, which DataLoader workers need under
+        # the spawn start method
+        return {name: getattr(self, name) for name in self.__slots__
+                if name not in self._TRANSIENT_SLOTS}
 
-        self.diacritics = [u'o', u'a', u'u', u'i', u'F', u'N', u'K', u'~']
-        self.consonants = [u'>', u'<', u'}', u'&', u'\'', u'b', u't', u'^', u'j', u'H', u'x', u'd', u'*', u'r',
-                          u'z', u's', u'$', u'S', u'D', u'T', u'Z', u'E', u'g', u'f', u'q', u'k', u'l', u'm', u'n', u'h', u'|']
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._init_ascii_codec()
+        self._init_caches()
 
     def arabic_to_buckwalter(self, word):
         """Convert input string to Buckwalter"""
-        res = ''
-        for letter in word:
-            if letter in self.arabic_to_buckw_dict:
-                res += self.arabic_to_buckw_dict[letter]
-            else:
-                res += letter
-        return res
+        # Characters missing from the table pass through unchanged
+        return word.translate(self._ar2bw_table)
+
+    def _arabic_to_buckwalter_ascii(self, text):
+        """Convert input string to Buckwalter as ASCII bytes; unmapped non-ASCII becomes '?'"""
+        return codecs.charmap_encode(text, 'replace', self._ar2bw_codec)[0].translate(self._ar2bw_bytes)
 
     def buckwalter_to_ipa_phoneme(self, buckwalter_phoneme):
         """Convert a single Buckwalter phoneme to IPA"""
@@ -103,101 +209,130 @@ class ArabicG2P:
         # Handle doubled consonants (gemination)
         if len(buckwalter_phoneme) == 2 and buckwalter_phoneme[0] == buckwalter_phoneme[1]:
             base_phoneme = self.buckwalter_to_ipa.get(buckwalter_phoneme[0], buckwalter_phoneme[0])
-            return base_phoneme + base_phoneme  # Gemination
+            return base_phoneme * 2  # Gemination
         
         # Fallback for unknown phonemes
         return buckwalter_phoneme
 
+    def normalize_utterance(self, utterance):
+        """Bring Arabic script to a canonical form before conversion"""
+        # NFC composes alef + combining madda/hamza into the precomposed
+        # letters arabic_to_buckw_dict knows and orders stacked diacritics
+        utterance = unicodedata.normalize('NFC', utterance)
+        if u'\u0651' in utterance:
+            utterance = _RE_SHADDA_AFTER_MARK.sub(u'\u0651\\1', utterance)
+        # Alef wasla is read as a plain alef; tatweel is purely typographic
+        utterance = utterance.replace(u'\u0671', u'\u0627')
+        utterance = utterance.replace(u'\u0640', u'')
+        return utterance
+
     def preprocess_utterance(self, utterance):
         """Do some normalisation work and split utterance to words"""
-        utterance = utterance.replace(u'AF', u'F')
-        utterance = utterance.replace(u'\u0640', u'')
-        utterance = utterance.replace(u'o', u'')
-        utterance = utterance.replace(u'aA', u'A')
-        utterance = utterance.replace(u'aY', u'Y')
-        utterance = utterance.replace(u' A', u' ')
-        utterance = utterance.replace(u'F', u'an')
-        utterance = utterance.replace(u'N', u'un')
-        utterance = utterance.replace(u'K', u'in')
-        utterance = utterance.replace(u'|', u'>A')
+        # Everything below works on ASCII bytes. Characters outside the
+        # Buckwalter alphabet become '?', which none of the rules match and
+        # which process_word_simple drops, just like the original character.
+        if isinstance(utterance, str):
+            utterance = utterance.encode('ascii', 'replace')
+        utterance = utterance.replace(b'AF', b'F')
+        utterance = utterance.translate(None, _STRIP_CHARS)
+        utterance = utterance.replace(b'aA', b'A')
+        utterance = utterance.replace(b'aY', b'Y')
+        utterance = utterance.replace(b' A', b' ')
+        utterance = utterance.replace(b'F', b'an')
+        utterance = utterance.replace(b'N', b'un')
+        utterance = utterance.replace(b'K', b'in')
+        utterance = utterance.replace(b'|', b'>A')
 
         # Deal with Hamza types
-        utterance = re.sub(u'Ai', u'<i', utterance)
-        utterance = re.sub(u'Aa', u'>a', utterance)
-        utterance = re.sub(u'Au', u'>u', utterance)
-        utterance = re.sub(u'^>([^auAw])', u'>a\\1', utterance)
-        utterance = re.sub(u' >([^auAw ])', u' >a\\1', utterance)
-        utterance = re.sub(u'<([^i])', u'<i\\1', utterance)
-        utterance = utterance.split(u' ')
+        utterance = _RE_HAMZA.sub(_hamza_repl, utterance)
+        utterance = utterance.decode('ascii').split(u' ')
         return utterance
 
     def process_word_simple(self, word):
         """Simplified word processing for better reliability"""
+        # Copy so callers cannot mutate the cached list
+        return list(self._word_cache(word))
+
+    def _process_word_simple(self, word):
         if not word or word in ['-', 'sil']:
             return ['sil']
         
-        # Convert to Buckwalter first
-        buckwalter_word = self.arabic_to_buckwalter(word)
+        # Convert to Buckwalter first; non-ASCII leftovers become '?' and are dropped
+        buckwalter_word = self._arabic_to_buckwalter_ascii(word)
         
-        # Simple phoneme extraction
-        phonemes = []
+        # Simple phoneme extraction, straight to IPA
+        ipa_table = self._ipa_table
+        ipa_phonemes = []
+        n = len(buckwalter_word)
         i = 0
-        while i < len(buckwalter_word):
-            char = buckwalter_word[i]
-            
+        while i < n:
             # Check for two-character combinations first
-            if i < len(buckwalter_word) - 1:
-                two_char = buckwalter_word[i:i+2]
-                if two_char in ['aa', 'ii', 'uu', 'AA', 'II', 'UU']:
-                    phonemes.append(two_char)
+            if i < n - 1:
+                long_vowel = self._long_vowel_ipa.get(buckwalter_word[i:i+2])
+                if long_vowel is not None:
+                    ipa_phonemes.append(long_vowel)
                     i += 2
                     continue
             
             # Single character
-            if char in self.unambiguousConsonantMap:
-                phonemes.append(self.unambiguousConsonantMap[char])
-            elif char in self.vowelMap:
-                phonemes.append(self.vowelMap[char])
-            elif char in self.consonants or char in ['w', 'y']:
-                phonemes.append(char)
+            ipa = ipa_table[buckwalter_word[i]]
+            if ipa:
+                ipa_phonemes.append(ipa)
             
             i += 1
         
-        # Convert Buckwalter phonemes to IPA
-        ipa_phonemes = []
-        for phoneme in phonemes:
-            ipa_phoneme = self.buckwalter_to_ipa_phoneme(phoneme)
-            if ipa_phoneme and ipa_phoneme != '':
-                ipa_phonemes.append(ipa_phoneme)
-        
         return ipa_phonemes if ipa_phonemes else ['sil']
 
     def process_utterance(self, utterance):
         """Main interface function - converts Arabic text to IPA phonemes"""
-        try:
-            # Convert Arabic to Buckwalter first
-            buckwalter_text = self.arabic_to_buckwalter(utterance)
-            
+        # Blank or non-string input is silence; any other error propagates
+        if not isinstance(utterance, str) or not utterance.strip():
+            return "sil"
+        return self._utterance_cache(utterance)
+
+    def _process_utterance(self, utterance):
+        utterance = self.normalize_utterance(utterance)
+        
+        # Convert Arabic to Buckwalter first
+        buckwalter_text = self._arabic_to_buckwalter_ascii(utterance)
+        
+        if _RE_NEEDS_RULES.search(utterance) is None:
+            # Fast path for undiacritised text, where only the ' A' rule
+            # of preprocess_utterance can apply
+            words = buckwalter_text.replace(b' A', b' ').decode('ascii').split(u' ')
+        else:
             # Preprocess
             words = self.preprocess_utterance(buckwalter_text)
+        
+        phonemes = []
+        for word in words:
+            if word in ['-', 'sil'] or not word.strip():
+                phonemes.append(['sil'])
+                continue
             
-            phonemes = []
-            for word in words:
-                if word in ['-', 'sil'] or not word.strip():
-                    phonemes.append(['sil'])
-                    continue
-                
-                phonemes_word = self.process_word_simple(word)
-                phonemes.append(phonemes_word)
-            
-            # Join phonemes with '+' separator between words and spaces between phonemes within words
-            final_sequence = ' + '.join(' '.join(str(phon) for phon in phones) for phones in phonemes)
-            return final_sequence
-            
-        except Exception as e:
-            print(f"Error processing utterance '{utterance}': {e}")
-            return "sil"
+            phonemes_word = self._word_cache(word)
+            phonemes.append(phonemes_word)
+        
+        # Join phonemes with '+' separator between words and spaces between phonemes within words
+        final_sequence = ' + '.join([' '.join(phones) for phones in phonemes])
+        return final_sequence
 
     def __call__(self, text):
         """Make the class callable like the English G2P"""
         return self.process_utterance(text)
+
+
+_INSTANCE = None
+
+
+def get_g2p():
+    """Return the shared ArabicG2P instance, creating it on first use.
+
+    All state is read-only after __init__ apart from the lru caches, which
+    are thread-safe, so one instance can serve every dataset and thread in
+    a process (and forked DataLoader workers inherit it warm).
+    """
+    global _INSTANCE
+    if _INSTANCE is None:
+        _INSTANCE = ArabicG2P()
+    return _INSTANCE
@@ -2,54 +2,118 @@
 import soundfile as sf
 import os
 import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 from pathlib import Path
 
-def check_audio_file(file_path):
-    """Check if an audio file can be read properly"""
+# libsndfile releases the GIL while reading, so threads overlap the disk I/O
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+def check_audio_file(file_path, full_decode=False):
+    """Check if an audio file can be read properly
+
+    Only the header is parsed by default; pass full_decode=True to decode
+    the whole stream and catch corruption past the header.
+    """
     try:
-        wave, sr = sf.read(file_path)
-        if len(wave) == 0:
+        if full_decode:
+            wave, sr = sf.read(file_path)
+            frames = len(wave)
+        else:
+            info = sf.info(file_path)
+            frames, sr = info.frames, info.samplerate
+        if frames == 0:
             return False, "Empty audio file"
-        return True, f"OK - {len(wave)} samples, {sr} Hz"
+        if sr <= 0:
+            return False, "Invalid sample rate"
+        return True, f"OK - {frames} samples, {sr} Hz"
     except Exception as e:
         return False, str(e)
 
-def check_dataset_files(data_list_path, max_check=100):
+def find_missing_files(paths, listings):
+    """Return the subset of paths that do not exist
+
+    Each directory referenced more than once is listed with a single
+    os.scandir instead of one stat per file. listings caches those
+    listings (directory -> set of names) across calls.
+    """
+    by_dir = defaultdict(list)
+    for path in paths:
+        by_dir[os.path.dirname(path)].append(path)
+    
+    missing = set()
+    for directory, dir_paths in by_dir.items():
+        names = listings.get(directory)
+        if names is None:
+            if len(dir_paths) == 1:
+                if not os.path.exists(dir_paths[0]):
+                    missing.add(dir_paths[0])
+                continue
+            try:
+                with os.scandir(directory or '.') as it:
+                    names = {entry.name for entry in it}
+            except OSError:
+                names = set()
+            listings[directory] = names
+        for path in dir_paths:
+            # Confirm misses with a stat, e.g. for case-insensitive filesystems
+            if os.path.basename(path) not in names and not os.path.exists(path):
+                missing.add(path)
+    return missing
+
+def validate_audio_path(file_path, full_decode=False, missing=frozenset()):
+    """Check that an audio file exists and can be read
+
+    missing holds the paths already known not to exist (see find_missing_files).
+    """
+    if file_path in missing:
+        return False, "File not found"
+    return check_audio_file(file_path, full_decode)
+
+def check_dataset_files(data_list_path, max_check=100, full_decode=False):
     """Check audio files in the dataset"""
     corrupted_files = []
     checked_files = []
     
-    with open(data_list_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    print(f"Checking up to {max_check} files from {data_list_path}")
     
-    print(f"Checking up to {min(max_check, len(lines))} files from {data_list_path}")
+    # Only the first max_check lines are read from the list
+    entries = []
+    with open(data_list_path, 'r', encoding='utf-8') as f:
+        for i, line in enumerate(islice(f, max_check)):
+            if not line.strip():
+                continue
+                
+            # Parse the line - assumes format: audio_path|text|speaker_id
+            parts = line.strip().split('|')
+            if len(parts) < 1:
+                continue
+                
+            entries.append((i, parts[0]))
     
-    for i, line in enumerate(lines[:max_check]):
-        if not line.strip():
-            continue
-            
-        # Parse the line - assumes format: audio_path|text|speaker_id
-        parts = line.strip().split('|')
-        if len(parts) < 1:
-            continue
-            
-        audio_path = parts[0]
-        
-        # Check if file exists
-        if not os.path.exists(audio_path):
-            corrupted_files.append((audio_path, f"File not found"))
-            print(f"❌ {i+1:3d}: File not found: {audio_path}")
-            continue
+    # Check the files in parallel; map() yields results in input order.
+    # The per-file report is buffered and written in one go afterwards.
+    report = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        paths = [audio_path for _, audio_path in entries]
+        missing = find_missing_files(paths, {})
+        results = executor.map(partial(validate_audio_path, full_decode=full_decode, missing=missing), paths)
+        for (i, audio_path), (is_valid, message) in zip(entries, results):
+            if message == "File not found":
+                corrupted_files.append((audio_path, message))
+                report.append(f"❌ {i+1:3d}: File not found: {audio_path}\n")
+                continue
+                
+            checked_files.append((audio_path, is_valid, message))
             
-        # Check if file can be read
-        is_valid, message = check_audio_file(audio_path)
-        checked_files.append((audio_path, is_valid, message))
-        
-        if not is_valid:
-            corrupted_files.append((audio_path, message))
-            print(f"❌ {i+1:3d}: {audio_path} - {message}")
-        else:
-            print(f"✅ {i+1:3d}: {audio_path} - {message}")
+            if not is_valid:
+                corrupted_files.append((audio_path, message))
+                report.append(f"❌ {i+1:3d}: {audio_path} - {message}\n")
+            else:
+                report.append(f"✅ {i+1:3d}: {audio_path} - {message}\n")
+    sys.stdout.writelines(report)
     
     print(f"\n📊 Summary:")
     print(f"Total checked: {len(checked_files)}")
@@ -58,8 +122,7 @@ def check_dataset_files(data_list_path, max_check=100):
     
     if corrupted_files:
         print(f"\n🚨 Corrupted files found:")
-        for file_path, error in corrupted_files:
-            print(f"  - {file_path}: {error}")
+        sys.stdout.writelines(f"  - {file_path}: {error}\n" for file_path, error in corrupted_files)
     
     return corrupted_files
 
@@ -23,7 +23,7 @@ logger.setLevel(logging.DEBUG)
 from text_utils import TextCleaner
 
 # Add the Arabic G2P implementation
-from arabic_g2p import ArabicG2P  # You'll create this file
+from arabic_g2p import get_g2p
 
 np.random.seed(1)
 random.seed(1)
@@ -59,7 +59,7 @@ class MelDataset(torch.utils.data.Dataset):
         self.mean, self.std = -4, 4
         
         # Replace English G2P with Arabic G2P
-        self.g2p = ArabicG2P()
+        self.g2p = get_g2p()
 
     def __len__(self):
         return len(self.data_list)
@@ -3,81 +3,205 @@
 Quick script to find and remove corrupted audio files from your dataset
 """
 import soundfile as sf
+import json
 import os
 import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
-def check_audio_file(file_path):
-    """Check if an audio file can be read properly"""
+# libsndfile releases the GIL while reading, so threads overlap the disk I/O.
+# On network storage (NFS, mounted buckets) latency dominates and a few
+# hundred workers pay off; pass num_workers on the command line.
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Number of dataset lines parsed and dispatched to the pool at a time
+BATCH_SIZE = 1024
+
+def check_audio_file(file_path, full_decode=False):
+    """Check if an audio file can be read properly
+
+    Only the header is parsed by default; pass full_decode=True to decode
+    the whole stream and catch corruption past the header.
+    """
     try:
-        wave, sr = sf.read(file_path)
-        if len(wave) == 0:
+        if full_decode:
+            wave, sr = sf.read(file_path)
+            frames = len(wave)
+        else:
+            info = sf.info(file_path)
+            frames, sr = info.frames, info.samplerate
+        if frames == 0:
             return False, "Empty audio file"
         if sr <= 0:
             return False, "Invalid sample rate"
-        return True, f"OK - {len(wave)} samples, {sr} Hz"
+        return True, f"OK - {frames} samples, {sr} Hz"
     except Exception as e:
         return False, str(e)
 
-def clean_dataset(input_file, output_file=None):
-    """Clean dataset by removing lines with corrupted audio files"""
+def find_missing_files(paths, listings):
+    """Return the subset of paths that do not exist
+
+    Each directory referenced more than once is listed with a single
+    os.scandir instead of one stat per file. listings caches those
+    listings (directory -> set of names) across calls.
+    """
+    by_dir = defaultdict(list)
+    for path in paths:
+        by_dir[os.path.dirname(path)].append(path)
+    
+    missing = set()
+    for directory, dir_paths in by_dir.items():
+        names = listings.get(directory)
+        if names is None:
+            if len(dir_paths) == 1:
+                if not os.path.exists(dir_paths[0]):
+                    missing.add(dir_paths[0])
+                continue
+            try:
+                with os.scandir(directory or '.') as it:
+                    names = {entry.name for entry in it}
+            except OSError:
+                names = set()
+            listings[directory] = names
+        for path in dir_paths:
+            # Confirm misses with a stat, e.g. for case-insensitive filesystems
+            if os.path.basename(path) not in names and not os.path.exists(path):
+                missing.add(path)
+    return missing
+
+def validate_audio_path(file_path, full_decode=False, missing=frozenset()):
+    """Check that an audio file exists and can be read
+
+    missing holds the paths already known not to exist (see find_missing_files).
+    """
+    if file_path in missing:
+        return False, "File not found"
+    return check_audio_file(file_path, full_decode)
+
+def validate_audio_path_cached(file_path, manifest, full_decode=False, missing=frozenset()):
+    """Like validate_audio_path, but reuse the manifest result for unchanged files
+
+    A file counts as unchanged when its mtime and size match the manifest
+    record, which must also come from the same full_decode mode. Returns
+    (is_valid, message, record), where record goes into the new manifest
+    (None when the file does not exist).
+    """
+    if file_path in missing:
+        return False, "File not found", None
+    try:
+        st = os.stat(file_path)
+    except OSError as e:
+        return False, str(e), None
+    key = [st.st_mtime_ns, st.st_size, full_decode]
+    record = manifest.get(file_path)
+    if record is not None and record[:3] == key:
+        return record[3], record[4], record
+    is_valid, message = validate_audio_path(file_path, full_decode)
+    return is_valid, message, key + [is_valid, message]
+
+def load_manifest(manifest_file):
+    """Load the {path: [mtime_ns, size, full_decode, is_valid, message]} manifest"""
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, manifest_file):
+    """Write the manifest atomically so an interrupted run cannot corrupt it"""
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, manifest_file)
+
+def clean_dataset(input_file, output_file=None, full_decode=False, max_workers=MAX_WORKERS,
+                  manifest_file=None):
+    """Clean dataset by removing lines with corrupted audio files
+
+    Results are remembered in manifest_file (default: <input>_manifest.json)
+    so that a rerun skips every file unchanged since the previous one.
+    """
+    base, ext = os.path.splitext(input_file)
     if output_file is None:
-        base, ext = os.path.splitext(input_file)
         output_file = f"{base}_cleaned{ext}"
+    if manifest_file is None:
+        manifest_file = f"{base}_manifest.json"
     
     corrupted_files = []
-    valid_lines = []
+    valid_count = 0
     total_lines = 0
     
     print(f"🔍 Checking audio files in {input_file}...")
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    listings = {}
+    old_manifest = load_manifest(manifest_file)
+    manifest = {}
     
-    for i, line in enumerate(lines):
-        total_lines += 1
-        line = line.strip()
-        
-        if not line:
-            continue
-            
-        # Parse the line - assumes format: audio_path|text|speaker_id
-        parts = line.split('|')
-        if len(parts) < 1:
-            print(f"⚠️  Line {i+1}: Invalid format - {line}")
-            continue
-            
-        audio_path = parts[0]
-        
-        # Check if file exists
-        if not os.path.exists(audio_path):
-            corrupted_files.append((i+1, audio_path, "File not found"))
-            print(f"❌ Line {i+1}: File not found - {audio_path}")
-            continue
+    def check_batch(entries):
+        nonlocal valid_count
+        paths = [audio_path for _, _, audio_path in entries]
+        missing = find_missing_files(paths, listings)
+        # Check the files in parallel; map() yields results in input order
+        check = partial(validate_audio_path_cached, manifest=old_manifest,
+                        full_decode=full_decode, missing=missing)
+        results = executor.map(check, paths)
+        for (i, line, audio_path), (is_valid, message, record) in zip(entries, results):
+            if record is not None:
+                manifest[audio_path] = record
+            if not is_valid:
+                corrupted_files.append((i+1, audio_path, message))
+            else:
+                # Results arrive in input order on this thread, so valid
+                # lines can go straight to the output file
+                out.write(line + '\n')
+                valid_count += 1
+        # One progress line per batch; errors are reported together at the end
+        sys.stdout.write(f"✅ Processed {total_lines} lines, {len(corrupted_files)} corrupted so far...\n")
+    
+    # Stream the list and dispatch it in batches, so only BATCH_SIZE lines
+    # are held in flight however large the dataset is. The cleaned list is
+    # written to a temporary file and moved into place at the end, which
+    # also allows output_file to be the input file itself.
+    print(f"💾 Writing cleaned dataset to {output_file}...")
+    tmp_output_file = f"{output_file}.tmp"
+    with open(input_file, 'r', encoding='utf-8') as f, \
+            open(tmp_output_file, 'w', encoding='utf-8', buffering=1 << 20) as out, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        entries = []
+        for i, line in enumerate(f):
+            total_lines += 1
+            line = line.strip()
             
-        # Check if file can be read
-        is_valid, message = check_audio_file(audio_path)
-        
-        if not is_valid:
-            corrupted_files.append((i+1, audio_path, message))
-            print(f"❌ Line {i+1}: {audio_path} - {message}")
-        else:
-            valid_lines.append(line)
-            if i % 100 == 0:  # Print progress every 100 files
-                print(f"✅ Processed {i+1}/{len(lines)} files...")
+            if not line:
+                continue
+                
+            # Parse the line - assumes format: audio_path|text|speaker_id
+            parts = line.split('|')
+            if len(parts) < 1:
+                print(f"⚠️  Line {i+1}: Invalid format - {line}")
+                continue
+                
+            entries.append((i, line, parts[0]))
+            if len(entries) == BATCH_SIZE:
+                check_batch(entries)
+                entries = []
+        if entries:
+            check_batch(entries)
+    os.replace(tmp_output_file, output_file)
+    
+    sys.stdout.writelines(f"❌ Line {line_num}: {file_path} - {error}\n"
+                          for line_num, file_path, error in corrupted_files)
     
-    # Write cleaned dataset
-    print(f"\n💾 Writing cleaned dataset to {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for line in valid_lines:
-            f.write(line + '\n')
+    # Only paths seen in this run are kept, so the manifest does not grow stale
+    save_manifest(manifest, manifest_file)
     
     # Print summary
     print(f"\n📊 Summary:")
     print(f"Total lines: {total_lines}")
-    print(f"Valid files: {len(valid_lines)}")
+    print(f"Valid files: {valid_count}")
     print(f"Corrupted files: {len(corrupted_files)}")
-    print(f"Success rate: {len(valid_lines) / total_lines * 100:.1f}%")
+    print(f"Success rate: {valid_count / total_lines * 100:.1f}%")
     print(f"Cleaned dataset saved to: {output_file}")
     
     if corrupted_files:
@@ -85,26 +209,27 @@ def clean_dataset(input_file, output_file=None):
         corrupted_file = f"{os.path.splitext(input_file)[0]}_corrupted.txt"
         with open(corrupted_file, 'w', encoding='utf-8') as f:
             f.write("Line\tFile\tError\n")
-            for line_num, file_path, error in corrupted_files:
-                f.write(f"{line_num}\t{file_path}\t{error}\n")
+            f.writelines(f"{line_num}\t{file_path}\t{error}\n"
+                         for line_num, file_path, error in corrupted_files)
         print(f"Corrupted files list saved to: {corrupted_file}")
     
     return len(corrupted_files) == 0
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python quick_audio_fix.py <dataset_file> [output_file]")
-        print("Example: python quick_audio_fix.py train_list.txt train_list_cleaned.txt")
+        print("Usage: python quick_audio_fix.py <dataset_file> [output_file] [num_workers]")
+        print("Example: python quick_audio_fix.py train_list.txt train_list_cleaned.txt 256")
         sys.exit(1)
     
     input_file = sys.argv[1]
     output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else MAX_WORKERS
     
     if not os.path.exists(input_file):
         print(f"❌ Dataset file not found: {input_file}")
         sys.exit(1)
     
-    success = clean_dataset(input_file, output_file)
+    success = clean_dataset(input_file, output_file, max_workers=max_workers)
     
     if success:
         print(f"\n🎉 All files are valid! No cleaning needed.")